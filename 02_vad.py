@@ -1,66 +1,128 @@
 #!/usr/bin/env python3
-"""VAD processing with Silero"""
+"""VAD processing with Silero
+
+    02_vad.py              # current stream (or --stream <id>)
+    02_vad.py --backfill   # every stream with stream.m4a but no segments.json
+
+VAD_BACKEND=onnx batches windows from several streams (VAD_BATCH_STREAMS)
+and shards of each stream (VAD_SHARDS) into one inference call. A batch
+holds at most VAD_BATCH_MAX_S of audio; a longer stream runs alone.
+"""
 
 import json
 import os
+import subprocess
 import sys
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "lib"))
-from config import VAD_PARAMS
+from config import VAD_BACKEND, VAD_BATCH_STREAMS, VAD_BATCH_MAX_S, VAD_SHARDS, STREAMS_DIR
 from common import get_stream_dir
 
-import torch
-torch.set_num_threads(1)
+if __name__ == "__main__":
+    from daemon import delegate
+    delegate(__file__)
 
-def main():
-    stream_dir = get_stream_dir()
-    os.chdir(stream_dir)
-    
-    if not os.path.exists("stream.m4a"):
-        print("Error: stream.m4a not found")
-        sys.exit(1)
-    
-    print("Loading Silero VAD...")
-    model, utils = torch.hub.load(
-        repo_or_dir='snakers4/silero-vad',
-        model='silero_vad',
-        force_reload=False
-    )
-    get_speech_timestamps, read_audio, _, _, _ = utils
-    
-    print("Reading audio...")
-    wav = read_audio("stream.m4a", sampling_rate=16000)
-    
-    print("Running VAD...")
-    speech_timestamps = get_speech_timestamps(
-        wav,
-        model,
-        sampling_rate=16000,
-        min_silence_duration_ms=VAD_PARAMS["min_silence_duration_ms"],
-        speech_pad_ms=VAD_PARAMS["speech_pad_ms"],
-        min_speech_duration_ms=VAD_PARAMS["min_speech_duration_ms"],
-    )
-    
-    # Convert to seconds and add padding
-    pad = VAD_PARAMS["post_pad_s"]
-    segments = []
-    for i, ts in enumerate(speech_timestamps):
-        start = max(0, ts['start'] / 16000 - pad)
-        end = ts['end'] / 16000 + pad
-        segments.append({
-            "segment_id": i,
-            "start": round(start, 3),
-            "end": round(end, 3),
-            "duration": round(end - start, 3)
-        })
-    
-    with open("segments.json", "w") as f:
+from models import load_silero
+from segtable import SegmentTable
+from vad import SAMPLE_RATE, speech_timestamps, speech_probs_batched, timestamps_from_probs, to_segments
+
+def find_backfill_streams():
+    """Stream dirs with audio but no segments yet"""
+    dirs = []
+    for name in sorted(os.listdir(STREAMS_DIR)):
+        d = os.path.join(STREAMS_DIR, name)
+        if os.path.exists(os.path.join(d, "stream.m4a")) and not os.path.exists(os.path.join(d, "segments.json")):
+            dirs.append(d)
+    return dirs
+
+def audio_duration(path):
+    """Duration in seconds from ffprobe, 0 if unknown (or no ffprobe)"""
+    cmd = ["ffprobe", "-v", "quiet", "-show_entries", "format=duration", "-of", "csv=p=0", path]
+    try:
+        return float(subprocess.run(cmd, capture_output=True, text=True).stdout)
+    except (OSError, ValueError):
+        return 0.0
+
+def batch_groups(stream_dirs):
+    """Split streams into groups of at most VAD_BATCH_STREAMS and VAD_BATCH_MAX_S"""
+    groups, group, total = [], [], 0.0
+    for d in stream_dirs:
+        duration = audio_duration(os.path.join(d, "stream.m4a"))
+        if group and (len(group) == VAD_BATCH_STREAMS or total + duration > VAD_BATCH_MAX_S):
+            groups.append(group)
+            group, total = [], 0.0
+        group.append(d)
+        total += duration
+    if group:
+        groups.append(group)
+    return groups
+
+def write_segments(stream_dir, segments):
+    with open(os.path.join(stream_dir, "segments.json"), "w") as f:
         json.dump({"segments": segments}, f, indent=2)
-    
+    SegmentTable.from_segments(segments).save(os.path.join(stream_dir, "segments.npz"))
+
     total_duration = sum(s["duration"] for s in segments)
-    print(f"\nSegments: {len(segments)}")
+    print(f"\n{os.path.basename(stream_dir)}")
+    print(f"Segments: {len(segments)}")
     print(f"Total speech: {total_duration/60:.1f} min")
-    print(f"Output: segments.json")
+    print(f"Output: segments.json, segments.npz")
+
+def run_torch(stream_dirs):
+    model, utils = load_silero()
+    read_audio = utils[1]
+    for d in stream_dirs:
+        print(f"Reading audio: {os.path.basename(d)}")
+        wav = read_audio(os.path.join(d, "stream.m4a"), sampling_rate=SAMPLE_RATE)
+        print("Running VAD...")
+        write_segments(d, to_segments(speech_timestamps(wav, model, utils)))
+
+def run_onnx(stream_dirs):
+    model, utils = load_silero(onnx=True)
+    read_audio = utils[1]
+    for group in batch_groups(stream_dirs):
+        dirs, wavs = [], []
+        for d in group:
+            print(f"Reading audio: {os.path.basename(d)}")
+            wav = read_audio(os.path.join(d, "stream.m4a"), sampling_rate=SAMPLE_RATE)
+            if len(wav):
+                dirs.append(d)
+                wavs.append(wav)
+            else:
+                print("No audio decoded (truncated stream.m4a?)")
+                write_segments(d, [])
+        if not wavs:
+            continue
+
+        print(f"Running VAD ({len(dirs)} streams x {VAD_SHARDS} shards per call)...")
+        all_probs = speech_probs_batched(wavs, model, shards=VAD_SHARDS)
+        for d, wav, probs in zip(dirs, wavs, all_probs):
+            write_segments(d, to_segments(timestamps_from_probs(wav, probs, utils)))
+
+def main():
+    if "--backfill" in sys.argv:
+        stream_dirs = find_backfill_streams()
+        if not stream_dirs:
+            print("Nothing to backfill")
+            return
+        print(f"Backfilling {len(stream_dirs)} streams")
+    else:
+        stream_dir = get_stream_dir()
+        os.chdir(stream_dir)
+
+        if not os.path.exists("stream.m4a"):
+            print("Error: stream.m4a not found")
+            sys.exit(1)
+        stream_dirs = [stream_dir]
+
+    if VAD_BACKEND == "onnx":
+        run_onnx(stream_dirs)
+    elif VAD_BACKEND == "torch":
+        run_torch(stream_dirs)
+    else:
+        print(f"Error: unknown VAD_BACKEND '{VAD_BACKEND}' (torch or onnx)")
+        sys.exit(1)
+
     print(f"\nNext: ../../03_extract.py")
 
 if __name__ == "__main__":
@@ -5,14 +5,18 @@ import json
 import os
 import sys
 import time
-import glob
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "lib"))
-from config import GEMINI_MODEL, BATCH_SIZE, EDGE_PADDING, MAX_RETRIES, TARGET_LANGUAGE, get_api_key
-from common import get_stream_dir, to_mmss
+from config import BATCH_SIZE, MAX_RETRIES, TARGET_LANGUAGE, DEDUP
+from common import get_stream_dir, get_request_budget, to_mmss, batch_audio_path
 
-from google import genai
-from google.genai import types
+if __name__ == "__main__":
+    from daemon import delegate
+    delegate(__file__)
+
+from models import get_client_pool
+from clientpool import QuotaExhausted
+from segtable import SegmentTable
 import typing_extensions as typing
 
 sys.stdout.reconfigure(line_buffering=True)
@@ -23,6 +27,12 @@ class ClipTranscription(typing.TypedDict):
     original: str
     english: str
 
+def print_pool_stats(pool):
+    lines = pool.report()
+    if lines:
+        print("Shards:")
+        print("\n".join(lines))
+
 def main():
     stream_dir = get_stream_dir()
     os.chdir(stream_dir)
@@ -31,18 +41,20 @@ def main():
         print("Error: segments.json not found")
         sys.exit(1)
     
-    with open("segments.json") as f:
-        segments = json.load(f)["segments"]
+    table = SegmentTable.load()
     
-    batch_files = sorted(glob.glob("batch_audio/batch_*.m4a"))
-    if not batch_files:
-        print("Error: No batch audio files. Run 03_extract.py first.")
+    num_batches = table.num_batches
+    missing = [b for b in range(num_batches) if not os.path.exists(batch_audio_path(b))]
+    if missing:
+        print(f"Error: {len(missing)}/{num_batches} batch audio files missing. Run 03_extract.py first.")
         sys.exit(1)
     
-    print(f"Segments: {len(segments)}")
-    print(f"Batches: {len(batch_files)}")
+    print(f"Segments: {len(table)}")
+    print(f"Batches: {num_batches}")
     
-    client = genai.Client(api_key=get_api_key())
+    pool = get_client_pool()
+    pool.reset_stats(budget=get_request_budget())
+    print(f"Shards: {len(pool.shards)} ({', '.join(s.name for s in pool.shards)})")
     
     # Resume support
     output_file = "transcriptions.json"
@@ -56,21 +68,54 @@ def main():
         all_transcriptions = []
         done_batches = set()
     
-    for batch_idx, batch_file in enumerate(batch_files):
+    reuse = None
+    if DEDUP:
+        from fingerprint import Reuse
+        reuse = Reuse(stream_dir)
+    deduped_batches = 0
+    
+    for batch_idx in range(num_batches):
         if batch_idx in done_batches:
             continue
         
-        batch_segs = segments[batch_idx * BATCH_SIZE : (batch_idx + 1) * BATCH_SIZE]
-        if not batch_segs:
-            continue
+        batch_file = batch_audio_path(batch_idx)
+        rows = table.batch_range(batch_idx)
+        starts = table.start[rows].tolist()
+        ends = table.end[rows].tolist()
         
         # Calculate relative timestamps
-        audio_start = max(0, batch_segs[0]["start"] - EDGE_PADDING)
+        audio_start, _ = table.batch_audio_span(batch_idx)
         rel_timestamps = []
-        for seg in batch_segs:
-            rel_start = seg["start"] - audio_start
-            rel_end = seg["end"] - audio_start
-            rel_timestamps.append(f"{to_mmss(rel_start)}-{to_mmss(rel_end)}")
+        for start, end in zip(starts, ends):
+            rel_timestamps.append(f"{to_mmss(start - audio_start)}-{to_mmss(end - audio_start)}")
+        
+        # Reuse transcriptions of identical audio from other streams.
+        # Batch audio is one upload, so only skip the call if every clip matched.
+        if reuse:
+            reused = []
+            for i, rel in enumerate(rel_timestamps):
+                tr, source = reuse.transcription(batch_idx * BATCH_SIZE + i)
+                if not tr:
+                    continue
+                rel_start, rel_end = rel.split("-")
+                reused.append({
+                    "start": rel_start,
+                    "end": rel_end,
+                    "original": tr["original"],
+                    "english": tr["english"],
+                    "clip_id": batch_idx * BATCH_SIZE + i,
+                    "batch_idx": batch_idx,
+                    "absolute_start": starts[i],
+                    "absolute_end": ends[i],
+                    "dedup_of": source,
+                })
+            if len(reused) == len(starts):
+                all_transcriptions.extend(reused)
+                deduped_batches += 1
+                print(f"[{batch_idx+1}/{num_batches}] ✓ {len(reused)} clips (dedup)")
+                with open(output_file, "w") as f:
+                    json.dump({"transcriptions": all_transcriptions}, f, indent=2, ensure_ascii=False)
+                continue
         
         prompt = f"""You are transcribing {TARGET_LANGUAGE} audio clips.
 
@@ -83,62 +128,55 @@ For each segment, provide:
 - original: exact transcription in {TARGET_LANGUAGE} (include any English/Japanese words as spoken)
 - english: natural English translation
 
-Return exactly {len(batch_segs)} transcriptions in chronological order.
+Return exactly {len(starts)} transcriptions in chronological order.
 """
         
         for attempt in range(MAX_RETRIES):
             try:
-                audio_file = client.files.upload(file=batch_file)
-                
-                result = client.models.generate_content(
-                    model=GEMINI_MODEL,
-                    contents=[types.Content(parts=[
-                        types.Part.from_uri(file_uri=audio_file.uri, mime_type="audio/mp4"),
-                        types.Part.from_text(text=prompt),
-                    ])],
-                    config={"response_mime_type": "application/json", "response_schema": list[ClipTranscription]},
-                )
-                
-                batch_results = json.loads(result.text)
+                batch_results = pool.generate_with_audio(batch_file, prompt, list[ClipTranscription])
                 
-                # Add metadata
-                for i, (tr, seg) in enumerate(zip(batch_results, batch_segs)):
+                # Add metadata (extra clips beyond the segment count have no clip to map to)
+                misaligned = len(batch_results) != len(starts)
+                batch_results = batch_results[:len(starts)]
+                for i, tr in enumerate(batch_results):
                     clip_id = batch_idx * BATCH_SIZE + i
                     tr["clip_id"] = clip_id
                     tr["batch_idx"] = batch_idx
-                    tr["absolute_start"] = seg["start"]
-                    tr["absolute_end"] = seg["end"]
+                    tr["absolute_start"] = starts[i]
+                    tr["absolute_end"] = ends[i]
+                    if misaligned:
+                        tr["batch_misaligned"] = True
                 
                 all_transcriptions.extend(batch_results)
                 
-                try:
-                    client.files.delete(name=audio_file.name)
-                except:
-                    pass
-                
-                print(f"[{batch_idx+1}/{len(batch_files)}] ✓ {len(batch_results)} clips")
+                note = f" (expected {len(starts)})" if misaligned else ""
+                print(f"[{batch_idx+1}/{num_batches}] ✓ {len(batch_results)} clips{note}")
                 break
                 
+            except QuotaExhausted as e:
+                print(f"\n[{batch_idx+1}/{num_batches}] {e}. Saving progress...")
+                with open(output_file, "w") as f:
+                    json.dump({"transcriptions": all_transcriptions}, f, indent=2, ensure_ascii=False)
+                print(f"Saved {len(all_transcriptions)} transcriptions. Resume later.")
+                print_pool_stats(pool)
+                sys.exit(1)
+            
             except Exception as e:
                 error_str = str(e)
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                    print(f"\n[{batch_idx+1}/{len(batch_files)}] Rate limited. Saving progress...")
-                    with open(output_file, "w") as f:
-                        json.dump({"transcriptions": all_transcriptions}, f, indent=2, ensure_ascii=False)
-                    print(f"Saved {len(all_transcriptions)} transcriptions. Resume later.")
-                    sys.exit(1)
-                
                 if attempt < MAX_RETRIES - 1:
-                    print(f"[{batch_idx+1}/{len(batch_files)}] Retry {attempt+1}...")
+                    print(f"[{batch_idx+1}/{num_batches}] Retry {attempt+1}...")
                     time.sleep(2 ** attempt)
                 else:
-                    print(f"[{batch_idx+1}/{len(batch_files)}] ✗ Failed: {error_str[:60]}")
+                    print(f"[{batch_idx+1}/{num_batches}] ✗ Failed: {error_str[:60]}")
         
         # Incremental save
         with open(output_file, "w") as f:
             json.dump({"transcriptions": all_transcriptions}, f, indent=2, ensure_ascii=False)
     
     print(f"\nDone. Total: {len(all_transcriptions)} transcriptions")
+    if reuse:
+        print(f"Dedup: {reuse.hits}/{reuse.checked} clips matched ({reuse.hit_rate():.1%}), {deduped_batches} batches skipped")
+    print_pool_stats(pool)
     print(f"Output: {output_file}")
     print(f"\nNext: ../../05_clean.py")
 
@@ -8,13 +8,19 @@ import os
 
 # Add lib to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "lib"))
-from config import GEMINI_MODEL, RPM_LIMIT, WORKERS, MAX_RETRIES, TARGET_LANGUAGE, get_api_key
-from common import get_stream_dir
+from config import RPM_LIMIT, WORKERS, MAX_RETRIES, TARGET_LANGUAGE, DEDUP, VERIFY_SELECTIVE
+from common import get_stream_dir, get_request_budget
+
+if __name__ == "__main__":
+    from daemon import delegate
+    delegate(__file__)
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock, Event
-from google import genai
-from google.genai import types
+from models import get_client_pool
+from clientpool import QuotaExhausted
+from confidence import select, estimate
+from segtable import SegmentTable
 import typing_extensions as typing
 
 sys.stdout.reconfigure(line_buffering=True)
@@ -26,28 +32,14 @@ class Verification(typing.TypedDict):
     corrected_english: str
     notes: str
 
-class RateLimiter:
-    def __init__(self, rpm):
-        self.interval = 60.0 / rpm
-        self.lock = Lock()
-        self.last_request = 0
-    
-    def acquire(self):
-        with self.lock:
-            now = time.time()
-            wait = self.last_request + self.interval - now
-            if wait > 0:
-                time.sleep(wait)
-            self.last_request = time.time()
-
 def main():
     stream_dir = get_stream_dir()
     os.chdir(stream_dir)
     
-    client = genai.Client(api_key=get_api_key())
+    pool = get_client_pool()
+    pool.reset_stats(budget=get_request_budget())
     results_lock = Lock()
     abort_event = Event()
-    rate_limiter = RateLimiter(RPM_LIMIT)
     all_results = {}
     
     # Find input file
@@ -73,13 +65,6 @@ def main():
         
         for attempt in range(MAX_RETRIES):
             try:
-                rate_limiter.acquire()
-                
-                if abort_event.is_set():
-                    return clip_id, None, "aborted"
-                
-                audio_file = client.files.upload(file=clip_file)
-                
                 prompt = f"""Listen to this {TARGET_LANGUAGE} audio clip.
 
 Previous transcription:
@@ -95,31 +80,20 @@ Verify the transcription accuracy:
 
 Include any English/Japanese words exactly as spoken."""
 
-                result = client.models.generate_content(
-                    model=GEMINI_MODEL,
-                    contents=[types.Content(parts=[
-                        types.Part.from_uri(file_uri=audio_file.uri, mime_type="audio/mp4"),
-                        types.Part.from_text(text=prompt),
-                    ])],
-                    config={"response_mime_type": "application/json", "response_schema": Verification},
-                )
+                if abort_event.is_set():
+                    return clip_id, None, "aborted"
                 
-                v = json.loads(result.text)
+                v = pool.generate_with_audio(clip_file, prompt, Verification)
                 v["clip_id"] = clip_id
                 
-                try:
-                    client.files.delete(name=audio_file.name)
-                except:
-                    pass
-                
                 return clip_id, v, None
                 
+            except QuotaExhausted as e:
+                abort_event.set()
+                return clip_id, None, f"rate_limit: {e}"
+            
             except Exception as e:
                 error_str = str(e)
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                    abort_event.set()
-                    return clip_id, None, "rate_limit"
-                
                 if attempt < MAX_RETRIES - 1:
                     time.sleep(2 ** attempt)
                 else:
@@ -134,6 +108,26 @@ Include any English/Japanese words exactly as spoken."""
     expected_ids = set(t["clip_id"] for t in transcriptions)
     print(f"Input: {input_file} ({len(transcriptions)} clips)", flush=True)
     
+    # Selective verification: clips the local scorer flags, plus an audit sample
+    selection = None
+    if "--all" in sys.argv or not VERIFY_SELECTIVE:
+        if os.path.exists("verify_selection.json"):
+            os.remove("verify_selection.json")
+    elif os.path.exists("segments.json"):
+        table = SegmentTable.load()
+        raw = transcriptions
+        if input_file != "transcriptions.json" and os.path.exists("transcriptions.json"):
+            with open("transcriptions.json") as f:
+                raw = json.load(f)["transcriptions"]
+        selection = select(transcriptions, table, raw, seed=os.path.basename(stream_dir))
+        with open("verify_selection.json", "w") as f:
+            json.dump(selection, f, indent=2)
+        
+        expected_ids = set(selection["flagged"]) | set(selection["audit"])
+        transcriptions = [t for t in transcriptions if t["clip_id"] in expected_ids]
+        print(f"Selective: {len(selection['flagged'])} flagged + {len(selection['audit'])} audit, "
+              f"{len(selection['skipped'])} skipped (--all to verify everything)", flush=True)
+    
     # Resume from existing
     if os.path.exists(output_file):
         with open(output_file) as f:
@@ -144,11 +138,32 @@ Include any English/Japanese words exactly as spoken."""
     done_ids = set(all_results.keys())
     todo = [t for t in transcriptions if t["clip_id"] not in done_ids]
     
+    # Reuse verifications of identical audio from other streams
+    reuse = None
+    if DEDUP and todo:
+        from fingerprint import Reuse
+        reuse = Reuse(stream_dir)
+        remaining_todo = []
+        for t in todo:
+            v, source = reuse.verification(t)
+            if v:
+                all_results[t["clip_id"]] = v
+            else:
+                remaining_todo.append(t)
+        if reuse.hits:
+            save_results()
+        print(f"Dedup: {reuse.hits}/{reuse.checked} clips matched ({reuse.hit_rate():.1%})", flush=True)
+        todo = remaining_todo
+    
     if not todo:
         print("All clips already verified!", flush=True)
         return
     
-    print(f"Verifying {len(todo)} remaining clips ({WORKERS} workers, {RPM_LIMIT} RPM)...\n", flush=True)
+    print(f"Verifying {len(todo)} remaining clips ({WORKERS} workers, {len(pool.shards)} shards x {RPM_LIMIT} RPM)...\n", flush=True)
+    
+    # Marks the stream as interrupted for tools/scheduler.py even if this
+    # run stops before the first result is saved
+    open("verify_started", "w").close()
     
     start_time = time.time()
     verified_this_run = 0
@@ -161,8 +176,8 @@ Include any English/Japanese words exactly as spoken."""
         for future in as_completed(futures):
             clip_id, v, error = future.result()
             
-            if error == "rate_limit":
-                print(f"\n[{clip_id:04d}] RATE LIMITED - aborting", flush=True)
+            if error and error.startswith("rate_limit"):
+                print(f"\n[{clip_id:04d}] RATE LIMITED ({error[12:]}) - aborting", flush=True)
                 rate_limited = True
                 for f in futures:
                     f.cancel()
@@ -186,7 +201,7 @@ Include any English/Japanese words exactly as spoken."""
                 print(line, flush=True)
     
     elapsed = time.time() - start_time
-    total_done = len(all_results)
+    total_done = len(expected_ids & set(all_results))
     remaining = len(expected_ids) - total_done
     corrections = len([r for r in all_results.values() if not (r["original"] and r["english"])])
     
@@ -198,6 +213,18 @@ Include any English/Japanese words exactly as spoken."""
     print(f"Total verified: {total_done}/{len(expected_ids)}", flush=True)
     print(f"Remaining: {remaining}", flush=True)
     print(f"Corrections flagged: {corrections}", flush=True)
+    if selection:
+        est = estimate(selection, all_results)
+        print(f"API calls saved by selection: {len(selection['skipped'])}", flush=True)
+        if est["precision"] is not None:
+            print(f"Scorer precision: {est['precision']:.1%} of {est['flagged_verified']} flagged clips needed fixes", flush=True)
+        if est["audit_miss_rate"] is not None:
+            print(f"Audit miss rate: {est['audit_miss_rate']:.1%} of {est['audit_verified']} audited clips "
+                  f"(~{est['estimated_missed']:.0f} bad clips among skipped)", flush=True)
+    shard_lines = pool.report()
+    if shard_lines:
+        print("Shards:", flush=True)
+        print("\n".join(shard_lines), flush=True)
     
     if remaining > 0:
         print(f"\nRun again when quota resets.", flush=True)
@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
-"""Build Anki deck from verified/cleaned transcriptions"""
+"""Build Anki deck from verified/cleaned transcriptions
+
+    08_build_deck.py [--range 01:23:00-01:25:00]   # only clips overlapping a time range
+"""
 
 import json
 import os
@@ -7,7 +10,8 @@ import sys
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "lib"))
 from config import TARGET_LANGUAGE
-from common import get_stream_dir, load_drops, load_stream_meta
+from common import get_stream_dir, get_time_range, load_drops, load_stream_meta
+from segtable import SegmentTable
 
 import genanki
 
@@ -53,6 +57,20 @@ def main():
             english = v["corrected_english"] if v["corrected_english"] else orig_t.get("english", "")
             if original and english:
                 cards_source.append({"clip_id": cid, "original": original, "english": english})
+        
+        # Clips the confidence scorer judged fine were never sent for verification
+        if os.path.exists("verify_selection.json"):
+            with open("verify_selection.json") as f:
+                skipped = set(json.load(f)["skipped"])
+            verified_ids = set(v["clip_id"] for v in verified)
+            accepted = 0
+            for cid in sorted(skipped - verified_ids - drops):
+                t = trans_map.get(cid)
+                if t:
+                    cards_source.append({"clip_id": cid, "original": t["original"], "english": t["english"]})
+                    accepted += 1
+            cards_source.sort(key=lambda c: c["clip_id"])
+            print(f"Including {accepted} clips skipped by selective verification")
     else:
         # No verification - use raw transcriptions
         if os.path.exists("transcriptions_cleaned.json"):
@@ -74,6 +92,16 @@ def main():
                     "english": t["english"]
                 })
     
+    # Restrict to clips overlapping --range
+    time_range = get_time_range()
+    if time_range:
+        if not (os.path.exists("segments.json") or os.path.exists("segments.npz")):
+            print("Error: --range needs segments.json")
+            sys.exit(1)
+        wanted = set(SegmentTable.load().overlapping(*time_range).tolist())
+        print(f"Range {sys.argv[sys.argv.index('--range') + 1]}: {len(wanted)} segments")
+        cards_source = [c for c in cards_source if c["clip_id"] in wanted]
+    
     model = genanki.Model(
         MODEL_ID,
         f'{TARGET_LANGUAGE} Listening',
@@ -0,0 +1,223 @@
+"""Gemini client pool: several API keys x model tiers
+
+Each (key, model) pair is a shard with its own rate limiter and quota
+state. Requests go to the shard that can send soonest, then the preferred
+model tier, then the most requests left today per the ledger. A shard that hits
+RESOURCE_EXHAUSTED is parked and the request fails over to the next one.
+QuotaExhausted is raised only when every shard is parked.
+
+With a Ledger attached, every request is recorded there, shards already
+used up today (by this or any other process) are skipped until the quota
+resets, and a shard that already has RPM_LIMIT requests in the ledger this
+minute waits for the next one, so concurrent processes share the rate
+limit. A budget caps requests for this pool (used by the scheduler).
+
+Uploads are per key, so upload + generate + delete run on one shard.
+Clients come from client_factory(key) and only need
+generate_with_audio(model, path, prompt, schema, mime_type); tests pass
+a fake one.
+"""
+
+import json
+import time
+from threading import Lock
+
+from config import GEMINI_MODELS, RPM_LIMIT, RPD_LIMIT, QUOTA_COOLDOWN_S, get_api_keys
+from ledger import shard_id, next_reset, next_minute
+
+class QuotaExhausted(Exception):
+    pass
+
+class BudgetSpent(QuotaExhausted):
+    """Request budget for this run used up (quota itself may remain)"""
+
+def is_quota_error(e):
+    error_str = str(e)
+    return "429" in error_str or "RESOURCE_EXHAUSTED" in error_str
+
+class GenaiClient:
+    """google-genai client for one API key"""
+
+    def __init__(self, key):
+        from google import genai
+        self.client = genai.Client(api_key=key)
+
+    def generate_with_audio(self, model, path, prompt, schema, mime_type):
+        from google.genai import types
+
+        audio_file = self.client.files.upload(file=path)
+        result = self.client.models.generate_content(
+            model=model,
+            contents=[types.Content(parts=[
+                types.Part.from_uri(file_uri=audio_file.uri, mime_type=mime_type),
+                types.Part.from_text(text=prompt),
+            ])],
+            config={"response_mime_type": "application/json", "response_schema": schema},
+        )
+        parsed = json.loads(result.text)
+
+        try:
+            self.client.files.delete(name=audio_file.name)
+        except:
+            pass
+        return parsed
+
+def genai_client_factory(key):
+    return GenaiClient(key)
+
+class RateLimiter:
+    """Spaces requests evenly at rpm; reserve() hands out the next slot"""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm
+        self.next_slot = 0
+
+    def wait_time(self, now):
+        return max(0, self.next_slot - now)
+
+    def reserve(self, now):
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        return slot - now
+
+class Shard:
+    def __init__(self, key, model, rpm, tier, client_factory):
+        self.key = key
+        self.model = model
+        self.id = shard_id(key, model)
+        self.tier = tier
+        self.limiter = RateLimiter(rpm)
+        self.client_factory = client_factory
+        self._client = None
+        self.parked_until = 0
+        self.quota_hits = 0  # Consecutive, drives cooldown backoff
+        self.reset_stats()
+
+    @property
+    def name(self):
+        return f"...{self.key[-4:]}/{self.model}"
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.client_factory(self.key)
+        return self._client
+
+    def reset_stats(self):
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "quota": 0, "busy_s": 0.0}
+
+    def park(self, now, used_today=0):
+        """Park after a quota error; until reset if the daily quota is near spent"""
+        self.quota_hits += 1
+        if used_today >= RPD_LIMIT * 0.9:
+            self.parked_until = next_reset(now)
+        else:
+            self.parked_until = now + min(QUOTA_COOLDOWN_S * 2 ** (self.quota_hits - 1), 3600)
+        return self.parked_until - now
+
+class ClientPool:
+    def __init__(self, keys=None, models=None, rpm=RPM_LIMIT, client_factory=genai_client_factory, ledger=None):
+        keys = keys or get_api_keys()
+        models = models or GEMINI_MODELS
+        self.shards = [
+            Shard(key, model, rpm, tier, client_factory)
+            for tier, model in enumerate(models)
+            for key in keys
+        ]
+        self.rpm = rpm
+        self.ledger = ledger
+        self.budget = 0  # Max requests until reset_stats(), 0 = unlimited
+        self.spent = 0
+        self.lock = Lock()
+        self.started = time.time()
+
+    def reset_stats(self, budget=0):
+        with self.lock:
+            self.started = time.time()
+            self.budget = budget
+            self.spent = 0
+            for shard in self.shards:
+                shard.reset_stats()
+
+    def _acquire(self):
+        """Pick the shard that can send soonest and reserve its next slot"""
+        with self.lock:
+            if self.budget and self.spent >= self.budget:
+                raise BudgetSpent(f"Request budget of {self.budget} used")
+
+            now = time.time()
+            minute_wait = {}  # Shards at RPM in the ledger (all processes) this minute
+            left_today = {}
+            if self.ledger:
+                data = self.ledger.snapshot()
+                for s in self.shards:
+                    used, this_minute, exhausted_until = self.ledger.shard_state(s.id, data)
+                    if used >= RPD_LIMIT:
+                        exhausted_until = max(exhausted_until, next_reset(now))
+                    s.parked_until = max(s.parked_until, exhausted_until)
+                    if this_minute >= self.rpm:
+                        minute_wait[s] = next_minute(now) - now
+                    left_today[s] = self.ledger.remaining_today(s.id, data)
+
+            live = [s for s in self.shards if s.parked_until <= now]
+            if not live:
+                raise QuotaExhausted("All shards out of quota")
+
+            def wait_time(s):
+                return max(s.limiter.wait_time(now), minute_wait.get(s, 0))
+
+            shard = min(live, key=lambda s: (wait_time(s), s.tier, -left_today.get(s, 0), s.stats["requests"]))
+            hold = minute_wait.get(shard, 0)
+            wait = hold + shard.limiter.reserve(now + hold)
+            shard.stats["requests"] += 1
+            self.spent += 1
+        if wait > 0:
+            time.sleep(wait)
+        return shard
+
+    def generate_with_audio(self, path, prompt, schema, mime_type="audio/mp4"):
+        """Upload audio, ask prompt with JSON schema, return parsed JSON"""
+        while True:
+            shard = self._acquire()
+            start = time.time()
+            try:
+                parsed = shard.client.generate_with_audio(shard.model, path, prompt, schema, mime_type)
+            except Exception as e:
+                quota = is_quota_error(e)
+                with self.lock:
+                    shard.stats["busy_s"] += time.time() - start
+                    if quota:
+                        shard.stats["quota"] += 1
+                        used = self.ledger.shard_state(shard.id)[0] if self.ledger else 0
+                        cooldown = shard.park(time.time(), used)
+                        print(f"  [{shard.name}] quota exhausted, parked {cooldown:.0f}s")
+                    else:
+                        shard.stats["errors"] += 1
+                if self.ledger:
+                    self.ledger.record(shard.id, exhausted_until=shard.parked_until if quota else None)
+                if quota:
+                    continue
+                raise
+
+            if self.ledger:
+                self.ledger.record(shard.id)
+            with self.lock:
+                shard.stats["busy_s"] += time.time() - start
+                shard.stats["ok"] += 1
+                shard.quota_hits = 0
+            return parsed
+
+    def report(self):
+        """Per-shard throughput lines"""
+        elapsed = max(time.time() - self.started, 1e-9)
+        lines = []
+        for s in self.shards:
+            st = s.stats
+            if not st["requests"]:
+                continue
+            finished = st["ok"] + st["errors"] + st["quota"]
+            lines.append(
+                f"  {s.name}: {st['ok']} ok, {st['errors']} errors, {st['quota']} quota hits, "
+                f"{st['ok'] * 60 / elapsed:.1f} req/min, {st['busy_s'] / max(finished, 1):.1f}s/request"
+            )
+        return lines
@@ -25,6 +25,23 @@ def get_stream_dir():
     print("Error: Run from stream directory or use --stream <id>", file=sys.stderr)
     sys.exit(1)
 
+def get_request_budget():
+    """Get API request budget from --budget arg or REQUEST_BUDGET (0 = unlimited)"""
+    for i, arg in enumerate(sys.argv):
+        if arg == "--budget" and i + 1 < len(sys.argv):
+            return int(sys.argv[i + 1])
+    
+    from config import REQUEST_BUDGET
+    return REQUEST_BUDGET
+
+def batch_audio_path(batch_idx):
+    """Batch audio file for batch_idx, relative to the stream dir.
+
+    Padding only keeps old streams' names; build paths from the index,
+    never sort them (batch_100 sorts before batch_11).
+    """
+    return f"batch_audio/batch_{batch_idx:02d}.m4a"
+
 def load_stream_meta(stream_dir):
     """Load stream.json metadata"""
     path = os.path.join(stream_dir, "stream.json")
@@ -50,3 +67,18 @@ def to_mmss(secs):
     total = round(secs)
     m, s = divmod(total, 60)
     return f"{m:02d}:{s:02d}"
+
+def parse_time(s):
+    """Parse HH:MM:SS, MM:SS or seconds to seconds"""
+    secs = 0.0
+    for part in s.split(":"):
+        secs = secs * 60 + float(part)
+    return secs
+
+def get_time_range():
+    """Get (start, end) seconds from --range HH:MM:SS-HH:MM:SS arg, or None"""
+    for i, arg in enumerate(sys.argv):
+        if arg == "--range" and i + 1 < len(sys.argv):
+            start, end = sys.argv[i + 1].split("-")
+            return parse_time(start), parse_time(end)
+    return None
@@ -0,0 +1,146 @@
+"""Local confidence scoring: which clips are worth verifying
+
+Batch transcription mostly goes wrong in recognisable ways: text for
+audio outside the clip (too many chars/sec, clips cut mid-sentence),
+missing text (too few chars/sec), a translation that doesn't fit the
+original, clips at batch edges, and batches where Gemini returned the
+wrong number of clips or drifted off the given timestamps.
+
+score() sums weighted suspicion features. Clips at or above
+VERIFY_THRESHOLD are flagged for 07_verify.py, plus a random audit sample
+of the rest (VERIFY_AUDIT_RATE) to measure what the scorer misses.
+Clips with no row in the segment table (Gemini returned more clips than
+the batch had) can't be scored and are always flagged.
+"""
+
+import random
+
+from config import VERIFY_THRESHOLD, VERIFY_AUDIT_RATE
+
+MAX_CPS = 22.0           # Chars/sec above this: likely phantom text
+MIN_CPS = 3.0            # Chars/sec below this (clips > 2s): likely missing text
+MIN_RATIO, MAX_RATIO = 0.5, 2.2  # english/original length
+TIGHT_GAP_S = 0.3        # Neighbouring segment this close: VAD cut mid-speech
+MAX_DRIFT_S = 2.0        # Returned timestamp vs requested
+
+WEIGHTS = {
+    "cps_high": 1.0,
+    "cps_low": 0.6,
+    "length_ratio": 0.6,
+    "tight_boundary": 0.5,
+    "batch_edge": 0.3,
+    "batch_misaligned": 1.0,
+    "timestamp_drift": 0.7,
+}
+
+def parse_mmss(s):
+    m, sec = s.split(":")
+    return int(m) * 60 + int(sec)
+
+def batch_counts(raw_transcriptions):
+    """Clips returned per batch, from uncleaned transcriptions.json"""
+    counts = {}
+    for t in raw_transcriptions:
+        b = t.get("batch_idx")
+        counts[b] = counts.get(b, 0) + 1
+    return counts
+
+def features(t, table, counts, gaps):
+    """Names of suspicion features present for transcription t.
+
+    table is a SegmentTable, gaps its (prev, next) gap arrays.
+    """
+    found = []
+    cid = t["clip_id"]
+    duration = max(float(table.duration[cid]), 0.1)
+    orig = t["original"].strip()
+    eng = t["english"].strip()
+
+    cps = len(orig) / duration
+    if cps > MAX_CPS:
+        found.append("cps_high")
+    elif cps < MIN_CPS and duration > 2.0:
+        found.append("cps_low")
+
+    if orig and not MIN_RATIO <= len(eng) / len(orig) <= MAX_RATIO:
+        found.append("length_ratio")
+
+    if min(gaps[0][cid], gaps[1][cid]) < TIGHT_GAP_S:
+        found.append("tight_boundary")
+
+    batch_idx = int(table.batch[cid])
+    rows = table.batch_range(batch_idx)
+    batch_len = rows.stop - rows.start
+    if cid == rows.start or cid == rows.stop - 1:
+        found.append("batch_edge")
+
+    if t.get("batch_misaligned") or counts.get(batch_idx, batch_len) != batch_len:
+        found.append("batch_misaligned")
+
+    audio_start, _ = table.batch_audio_span(batch_idx)
+    try:
+        drift = abs(parse_mmss(t["start"]) - (float(table.start[cid]) - audio_start))
+    except (KeyError, ValueError):
+        drift = 0.0
+    if drift > MAX_DRIFT_S:
+        found.append("timestamp_drift")
+
+    return found
+
+def score(found):
+    return sum(WEIGHTS[f] for f in found)
+
+def select(transcriptions, table, raw_transcriptions, seed):
+    """Split clips into flagged / audit / skipped, returns selection dict"""
+    counts = batch_counts(raw_transcriptions)
+    gaps = table.gaps()
+    flagged, rest, scores, reasons = [], [], {}, {}
+    for t in transcriptions:
+        cid = t["clip_id"]
+        if not 0 <= cid < len(table):
+            scores[cid] = None
+            reasons[cid] = ["no_segment"]
+            flagged.append(cid)
+            continue
+        found = features(t, table, counts, gaps)
+        scores[cid] = round(score(found), 2)
+        reasons[cid] = found
+        (flagged if scores[cid] >= VERIFY_THRESHOLD else rest).append(cid)
+
+    rng = random.Random(seed)
+    n_audit = min(len(rest), round(len(rest) * VERIFY_AUDIT_RATE))
+    audit = sorted(rng.sample(rest, n_audit))
+    audit_set = set(audit)
+    skipped = [cid for cid in rest if cid not in audit_set]
+
+    return {
+        "threshold": VERIFY_THRESHOLD,
+        "flagged": flagged,
+        "audit": audit,
+        "skipped": skipped,
+        "scores": {str(cid): s for cid, s in scores.items()},
+        "reasons": {str(cid): r for cid, r in reasons.items() if r},
+    }
+
+def needs_fix(v):
+    return not (v["original"] and v["english"])
+
+def estimate(selection, results):
+    """Scorer quality from verified clips: precision on flagged, miss rate on audit.
+
+    Returns dict, rates are None until enough clips are verified.
+    """
+    def rate(ids):
+        done = [results[cid] for cid in ids if cid in results]
+        return (sum(needs_fix(v) for v in done) / len(done), len(done)) if done else (None, 0)
+
+    precision, n_flagged = rate(selection["flagged"])
+    miss_rate, n_audit = rate(selection["audit"])
+    missed = miss_rate * len(selection["skipped"]) if miss_rate is not None else None
+    return {
+        "precision": precision,
+        "flagged_verified": n_flagged,
+        "audit_miss_rate": miss_rate,
+        "audit_verified": n_audit,
+        "estimated_missed": missed,
+    }
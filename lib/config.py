@@ -7,6 +7,8 @@ TARGET_LANGUAGE = os.environ.get("TARGET_LANGUAGE", "Indonesian")
 
 # API
 GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+# Model tiers for the client pool, preferred first
+GEMINI_MODELS = [m.strip() for m in os.environ.get("GEMINI_MODELS", GEMINI_MODEL).split(",") if m.strip()]
 
 def get_api_key():
     """Get API key from env or file"""
@@ -19,6 +21,22 @@ def get_api_key():
     
     raise ValueError("Set GEMINI_API_KEY env var or create ~/.gemini_key")
 
+def get_api_keys():
+    """Get all API keys: GEMINI_API_KEYS (comma-separated) or one per line in key file"""
+    if "GEMINI_API_KEYS" in os.environ:
+        keys = [k.strip() for k in os.environ["GEMINI_API_KEYS"].split(",") if k.strip()]
+        if keys:
+            return keys
+    
+    if "GEMINI_API_KEY" not in os.environ:
+        key_path = os.environ.get("GEMINI_KEY_PATH", os.path.expanduser("~/.gemini_key"))
+        if os.path.exists(key_path):
+            keys = [k.strip() for k in open(key_path) if k.strip() and not k.startswith("#")]
+            if keys:
+                return keys
+    
+    return [get_api_key()]
+
 # VAD parameters (Silero 6.2.0)
 VAD_PARAMS = {
     "min_silence_duration_ms": 300,
@@ -27,6 +45,13 @@ VAD_PARAMS = {
     "post_pad_s": 0.25,  # Added to start/end of each segment
 }
 
+# VAD backend: "torch" (one window per call) or "onnx" (batched, needs onnxruntime)
+VAD_BACKEND = os.environ.get("VAD_BACKEND", "torch")
+VAD_BATCH_STREAMS = 8    # Streams decoded and batched together (onnx)
+VAD_BATCH_MAX_S = 3 * 3600  # Cap on audio decoded per batch, ~690 MB at 16kHz float32 (onnx)
+VAD_SHARDS = 1           # Shards per stream, each a separate batch lane (onnx)
+VAD_SHARD_WARMUP_S = 2.0 # Audio replayed before each shard to settle model state
+
 # Transcription
 BATCH_SIZE = 20
 EDGE_PADDING = 0.5
@@ -35,6 +60,16 @@ EDGE_PADDING = 0.5
 RPM_LIMIT = 20
 WORKERS = 10
 MAX_RETRIES = 3
+VERIFY_SELECTIVE = os.environ.get("VERIFY_SELECTIVE", "1") != "0"  # Only verify clips the scorer flags
+VERIFY_THRESHOLD = 1.0   # Suspicion score at which a clip is flagged
+VERIFY_AUDIT_RATE = 0.05 # Fraction of unflagged clips verified anyway
+QUOTA_COOLDOWN_S = 60  # Shard parked this long after RESOURCE_EXHAUSTED (doubles per repeat)
+
+# Daily quota - requests per day per key/model, resets at midnight Pacific
+RPD_LIMIT = int(os.environ.get("RPD_LIMIT", 1500))
+QUOTA_TZ = "America/Los_Angeles"
+# Max API requests for one run, 0 = unlimited (set by the scheduler)
+REQUEST_BUDGET = int(os.environ.get("REQUEST_BUDGET", 0))
 
 # Paths - auto-detect from script location
 def _get_pipeline_root():
@@ -46,3 +81,22 @@ STREAMS_DIR = os.path.join(PIPELINE_ROOT, "streams")
 
 def get_stream_dir(stream_id):
     return os.path.join(STREAMS_DIR, stream_id)
+
+QUOTA_LEDGER = os.environ.get("QUOTA_LEDGER", os.path.join(STREAMS_DIR, "quota_ledger.json"))
+
+# Dedup - acoustic fingerprint index shared by all streams
+DEDUP = os.environ.get("DEDUP", "1") != "0"
+FINGERPRINT_DB = os.environ.get("FINGERPRINT_DB", os.path.join(STREAMS_DIR, "fingerprints.db"))
+
+# Daemon - resident worker keeping models/clients warm between runs
+DAEMON_SOCKET = os.environ.get("PIPELINE_SOCKET", os.path.join(PIPELINE_ROOT, ".pipeline.sock"))
+USE_DAEMON = os.environ.get("PIPELINE_DAEMON", "1") != "0"
+FFMPEG_WORKERS = int(os.environ.get("FFMPEG_WORKERS", os.cpu_count() or 4))
+
+# Every env var read above. The daemon reads config once at startup, so it
+# only takes jobs whose values for these match its own.
+CONFIG_ENV = [
+    "TARGET_LANGUAGE", "GEMINI_MODEL", "GEMINI_MODELS", "GEMINI_API_KEY", "GEMINI_API_KEYS",
+    "GEMINI_KEY_PATH", "VAD_BACKEND", "VERIFY_SELECTIVE", "RPD_LIMIT", "REQUEST_BUDGET",
+    "PIPELINE_ROOT", "QUOTA_LEDGER", "DEDUP", "FINGERPRINT_DB", "FFMPEG_WORKERS",
+]
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Resident pipeline worker behind a Unix socket
+
+Start it once:
+    python3 lib/daemon.py
+
+While it runs, 02/03/04/07 hand their job to it instead of importing torch
+or google-genai themselves. The daemon loads each stage script once and
+keeps Silero, the Gemini clients and the ffmpeg pool warm across jobs.
+Each job runs in a forked child of the warm process, one at a time
+(stages chdir into the stream dir). The child is killed when its client
+disconnects, so an interrupted run stops spending API quota.
+
+Protocol: client sends one JSON line {"script", "argv", "cwd", "env"},
+daemon replies with JSON lines {"out": text} ... and a final {"exit": code}.
+If the client's config env (CONFIG_ENV) differs from the daemon's, or
+another job is running, the daemon replies {"refuse": reason} and the
+script runs standalone.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import socket
+import sys
+
+# Client side must stay cheap - only stdlib imports above this point
+
+def _socket_path():
+    from config import DAEMON_SOCKET
+    return DAEMON_SOCKET
+
+def _config_env():
+    """Hashes of the config env vars (keys never leave the process in clear)"""
+    from config import CONFIG_ENV
+    return {
+        name: hashlib.sha1(os.environ[name].encode()).hexdigest() if name in os.environ else None
+        for name in CONFIG_ENV
+    }
+
+def delegate(script_path):
+    """Run this script in the daemon if one is listening.
+
+    Exits with the job's exit code when the daemon handled it, returns
+    otherwise (no daemon, or daemon refused) so the script runs locally.
+    """
+    from config import USE_DAEMON
+    if not USE_DAEMON:
+        return
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(_socket_path())
+    except OSError:
+        sock.close()
+        return
+
+    job = {
+        "script": os.path.abspath(script_path),
+        "argv": sys.argv[1:],
+        "cwd": os.getcwd(),
+        "env": _config_env(),
+    }
+    code = 1
+    with sock, sock.makefile("rwb") as f:
+        try:
+            f.write((json.dumps(job) + "\n").encode())
+            f.flush()
+            first = f.readline()
+        except (BrokenPipeError, ConnectionResetError):
+            first = b""
+        if not first:
+            print("Daemon: no reply, running standalone", file=sys.stderr)
+            return
+        for line in itertools.chain([first], f):
+            msg = json.loads(line)
+            if "refuse" in msg:
+                print(f"Daemon: {msg['refuse']}, running standalone", file=sys.stderr)
+                return
+            elif "out" in msg:
+                sys.stdout.write(msg["out"])
+                sys.stdout.flush()
+            elif "exit" in msg:
+                code = msg["exit"]
+                break
+    sys.exit(code)
+
+# Server side
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class _SocketWriter:
+    """File-like object forwarding writes to the client as JSON lines"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, s):
+        if s:
+            self.f.write((json.dumps({"out": s}, ensure_ascii=False) + "\n").encode())
+            self.f.flush()
+        return len(s)
+
+    def flush(self):
+        pass
+
+    def reconfigure(self, **kwargs):
+        pass
+
+STAGES = ["02_vad.py", "03_extract.py", "04_transcribe.py", "07_verify.py"]
+
+_modules = {}
+
+def _load_stage(path):
+    """Import a stage script (e.g. 04_transcribe.py) once and cache it"""
+    if path not in _modules:
+        import importlib.util
+        name = "stage_" + os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[path] = module
+    return _modules[path]
+
+def run_job(job, out):
+    """Run one stage job in-process, returns exit code"""
+    import contextlib
+    import traceback
+
+    path = job["script"]
+    if os.path.dirname(path) != _ROOT:
+        print(f"Refusing script outside pipeline root: {path}", file=out)
+        return 1
+
+    # Stages import lib/ modules directly, but common.get_stream_dir imports
+    # lib.config, which needs the pipeline root on the path (--stream <id>)
+    if _ROOT not in sys.path:
+        sys.path.append(_ROOT)
+
+    saved_argv = sys.argv
+    saved_cwd = os.getcwd()
+    sys.argv = [path] + job["argv"]
+    code = 0
+    try:
+        os.chdir(job["cwd"])
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            try:
+                _load_stage(path).main()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+    return code
+
+def _reply(f, msg):
+    f.write((json.dumps(msg) + "\n").encode())
+    f.flush()
+
+def _refuse(f, reason):
+    _reply(f, {"refuse": reason})
+    print(f"  refused: {reason}", flush=True)
+
+def _run_child(server, f, job):
+    """In the forked job process: run the job, exit with its code, never return"""
+    import traceback
+
+    code = 1
+    try:
+        server.close()
+        code = run_job(job, _SocketWriter(f))
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        os._exit(code)
+
+def _turn_away(server):
+    """Refuse a client that connects while a job is running"""
+    conn, _ = server.accept()
+    conn.settimeout(2)
+    with conn, conn.makefile("rwb") as f:
+        try:
+            f.readline()  # Unread data would reset the connection before it sees the reply
+            _refuse(f, "busy")
+        except OSError:
+            pass
+
+def _watch(server, conn, pid):
+    """Wait for job pid, killing it if its client disconnects.
+
+    Returns the job's exit code, or None if it was killed. The client only
+    hangs up early: {"exit"} is sent from here, after the job is reaped.
+    """
+    import select
+    import signal
+
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return os.waitstatus_to_exitcode(status)
+        ready, _, _ = select.select([server, conn], [], [], 0.5)
+        if server in ready:
+            _turn_away(server)
+        if conn in ready:
+            try:
+                gone = not conn.recv(4096)
+            except ConnectionResetError:
+                gone = True
+            if gone:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+                return None
+
+def serve(path):
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            print(f"Error: daemon already running on {path}")
+            sys.exit(1)
+        except OSError:
+            os.unlink(path)  # Stale socket
+        finally:
+            probe.close()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(8)
+    print(f"Listening on {path}", flush=True)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("rwb") as f:
+                try:
+                    job = json.loads(f.readline())
+                    name = os.path.basename(job["script"])
+                    print(f"Job: {name} {' '.join(job['argv'])} (cwd {job['cwd']})", flush=True)
+                    ours = _config_env()
+                    differs = sorted(k for k in set(ours) | set(job.get("env", {})) if ours.get(k) != job.get("env", {}).get(k))
+                    if differs:
+                        _refuse(f, f"config env differs ({', '.join(differs)})")
+                        continue
+                    pid = os.fork()
+                    if pid == 0:
+                        _run_child(server, f, job)
+                    code = _watch(server, conn, pid)
+                    if code is None:
+                        print("  client disconnected, job killed", flush=True)
+                        continue
+                    _reply(f, {"exit": code})
+                    print(f"  exit {code}", flush=True)
+                except (BrokenPipeError, ConnectionResetError):
+                    print("  client disconnected", flush=True)
+                except (ValueError, KeyError) as e:
+                    print(f"  bad request: {e}", flush=True)
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+def main():
+    from models import load_silero, get_client_pool, get_ffmpeg_pool
+
+    warm = "--no-warm" not in sys.argv
+    if warm:
+        load_silero()
+        try:
+            for shard in get_client_pool().shards:
+                shard.client
+        except ValueError as e:
+            print(f"Skipping Gemini client pool: {e}")
+        get_ffmpeg_pool()
+        # Imported in this process so each forked job starts with them loaded
+        for name in STAGES:
+            try:
+                _load_stage(os.path.join(_ROOT, name))
+            except Exception as e:
+                print(f"Skipping preload of {name}: {e}")
+
+    serve(_socket_path())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Acoustic fingerprint index for dedup across streams
+
+Landmark hashing: pick spectral peaks, pair each peak with a few that
+follow it, hash (freq1, freq2, dt). Two recordings of the same audio share
+many hashes at a constant time offset, even after re-encoding.
+
+The index is a SQLite file shared by all streams (FINGERPRINT_DB).
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+
+import numpy as np
+
+from config import FINGERPRINT_DB, STREAMS_DIR
+
+SAMPLE_RATE = 8000
+N_FFT = 1024
+HOP = 256                # 32ms frames
+BANDS = [(2, 16), (16, 32), (32, 64), (64, 128), (128, 256), (256, 512)]
+PEAKS_PER_SEC = 30
+FAN_OUT = 5
+MAX_DT = 63              # Frames, fits in 6 bits
+
+MIN_MATCHES = 20         # Aligned hashes needed for a match
+MIN_RATIO = 0.2          # Aligned hashes / hashes of the longer clip
+MIN_DURATION_RATIO = 0.7 # Shorter / longer clip duration
+
+def decode(path):
+    """Decode audio file to mono 8kHz float samples"""
+    cmd = ["ffmpeg", "-v", "quiet", "-i", path, "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    raw = subprocess.run(cmd, capture_output=True).stdout
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768
+
+def landmarks(samples):
+    """Spectral peaks as (frame, bin) arrays, strongest PEAKS_PER_SEC kept"""
+    if len(samples) < N_FFT:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    n_frames = 1 + (len(samples) - N_FFT) // HOP
+    idx = np.arange(N_FFT)[None, :] + HOP * np.arange(n_frames)[:, None]
+    spec = np.log1p(np.abs(np.fft.rfft(samples[idx] * np.hanning(N_FFT), axis=1)))
+
+    frames, bins, mags = [], [], []
+    for lo, hi in BANDS:
+        band = spec[:, lo:hi]
+        best = band.argmax(axis=1)
+        frames.append(np.arange(n_frames))
+        bins.append(best + lo)
+        mags.append(band[np.arange(n_frames), best])
+    frames = np.concatenate(frames)
+    bins = np.concatenate(bins)
+    mags = np.concatenate(mags)
+
+    keep = max(1, int(PEAKS_PER_SEC * len(samples) / SAMPLE_RATE))
+    top = np.argsort(mags)[::-1][:keep]
+    order = np.lexsort((bins[top], frames[top]))
+    return frames[top][order], bins[top][order]
+
+def hashes(samples):
+    """Landmark hashes as list of (hash, frame)"""
+    frames, bins = landmarks(samples)
+    out = []
+    for i in range(len(frames)):
+        paired = 0
+        for j in range(i + 1, len(frames)):
+            dt = frames[j] - frames[i]
+            if dt == 0:
+                continue
+            if dt > MAX_DT or paired >= FAN_OUT:
+                break
+            h = (int(bins[i]) >> 1) << 15 | (int(bins[j]) >> 1) << 6 | int(dt)
+            out.append((h, int(frames[i])))
+            paired += 1
+    return out
+
+class FingerprintIndex:
+    def __init__(self, path=FINGERPRINT_DB):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS clips (
+                id INTEGER PRIMARY KEY,
+                stream TEXT NOT NULL,
+                clip_id INTEGER NOT NULL,
+                n_hashes INTEGER NOT NULL,
+                duration REAL,
+                UNIQUE (stream, clip_id)
+            );
+            CREATE TABLE IF NOT EXISTS hashes (
+                hash INTEGER NOT NULL,
+                clip INTEGER NOT NULL,
+                t INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS hashes_hash ON hashes (hash);
+            CREATE INDEX IF NOT EXISTS hashes_clip ON hashes (clip);
+        """)
+        columns = [c[1] for c in self.db.execute("PRAGMA table_info(clips)")]
+        if "duration" not in columns:
+            with self.db:
+                self.db.execute("ALTER TABLE clips ADD COLUMN duration REAL")
+
+    def close(self):
+        self.db.close()
+
+    def _row(self, stream, clip_id):
+        return self.db.execute(
+            "SELECT id FROM clips WHERE stream = ? AND clip_id = ?", (stream, clip_id)
+        ).fetchone()
+
+    def add(self, stream, clip_id, path):
+        """Fingerprint a clip file unless already indexed, returns row id"""
+        row = self._row(stream, clip_id)
+        if row:
+            return row[0]
+        samples = decode(path)
+        hs = hashes(samples)
+        with self.db:
+            cur = self.db.execute(
+                "INSERT INTO clips (stream, clip_id, n_hashes, duration) VALUES (?, ?, ?, ?)",
+                (stream, clip_id, len(hs), len(samples) / SAMPLE_RATE),
+            )
+            self.db.executemany(
+                "INSERT INTO hashes (hash, clip, t) VALUES (?, ?, ?)",
+                [(h, cur.lastrowid, t) for h, t in hs],
+            )
+        return cur.lastrowid
+
+    def index_stream(self, stream_dir):
+        """Add every clip in stream_dir/clips, returns number newly indexed"""
+        stream = os.path.basename(stream_dir)
+        clips_dir = os.path.join(stream_dir, "clips")
+        added = 0
+        for name in sorted(os.listdir(clips_dir)) if os.path.isdir(clips_dir) else []:
+            if name.startswith("clip_") and name.endswith(".m4a"):
+                clip_id = int(name[5:-4])
+                if not self._row(stream, clip_id):
+                    self.add(stream, clip_id, os.path.join(clips_dir, name))
+                    added += 1
+        return added
+
+    def matches(self, stream, clip_id, path):
+        """Clips in other streams with the same audio, best first.
+
+        Both clips must be mostly covered by the aligned hashes and have
+        similar durations, so a clip that merely contains the query (or is
+        contained in it) doesn't count. Returns list of (stream, clip_id).
+        The query clip is indexed too.
+        """
+        row_id = self.add(stream, clip_id, path)
+        query = self.db.execute("SELECT hash, t FROM hashes WHERE clip = ?", (row_id,)).fetchall()
+        if not query:
+            return []
+        q_duration = self.db.execute("SELECT duration FROM clips WHERE id = ?", (row_id,)).fetchone()[0]
+
+        q_times = {}
+        for h, t in query:
+            q_times.setdefault(h, []).append(t)
+
+        votes = {}
+        keys = list(q_times)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            rows = self.db.execute(
+                f"SELECT h.hash, h.clip, h.t FROM hashes h JOIN clips c ON c.id = h.clip "
+                f"WHERE h.hash IN ({','.join('?' * len(chunk))}) AND c.stream != ?",
+                chunk + [stream],
+            )
+            for h, clip, t in rows:
+                for qt in q_times[h]:
+                    key = (clip, t - qt)
+                    votes[key] = votes.get(key, 0) + 1
+
+        best = {}
+        for (clip, _), n in votes.items():
+            best[clip] = max(best.get(clip, 0), n)
+
+        found = []
+        for clip, n in sorted(best.items(), key=lambda x: -x[1]):
+            if n < MIN_MATCHES:
+                break
+            other_stream, other_id, n_hashes, duration = self.db.execute(
+                "SELECT stream, clip_id, n_hashes, duration FROM clips WHERE id = ?", (clip,)
+            ).fetchone()
+            if n / max(len(query), n_hashes) < MIN_RATIO:
+                continue
+            # Rows indexed before durations were stored: hash count scales with duration
+            a, b = (q_duration, duration) if q_duration and duration else (len(query), n_hashes)
+            if min(a, b) / max(a, b) >= MIN_DURATION_RATIO:
+                found.append((other_stream, other_id))
+        return found
+
+class Reuse:
+    """Finds transcriptions/verifications of matching clips in other streams"""
+
+    def __init__(self, stream_dir, index=None):
+        self.stream = os.path.basename(stream_dir)
+        self.index = index or FingerprintIndex()
+        self._trans = {}
+        self._verif = {}
+        self.checked = 0
+        self.hits = 0
+
+    def _load(self, stream, name, cache):
+        if stream not in cache:
+            path = os.path.join(STREAMS_DIR, stream, name)
+            records = []
+            if os.path.exists(path):
+                with open(path) as f:
+                    data = json.load(f)
+                records = data if isinstance(data, list) else data["transcriptions"]
+            cache[stream] = {r["clip_id"]: r for r in records if "error" not in r}
+        return cache[stream]
+
+    def _find(self, clip_id, name, cache):
+        self.checked += 1
+        path = f"clips/clip_{clip_id:04d}.m4a"
+        if not os.path.exists(path):
+            return None, None
+        for stream, other_id in self.index.matches(self.stream, clip_id, path):
+            record = self._load(stream, name, cache).get(other_id)
+            if record:
+                return record, f"{stream}:{other_id}"
+        return None, None
+
+    def transcription(self, clip_id):
+        """Existing transcription for the same audio, or (None, None)"""
+        tr, source = self._find(clip_id, "transcriptions.json", self._trans)
+        if tr:
+            self.hits += 1
+        return tr, source
+
+    def verification(self, t):
+        """Existing verification for the same audio, if it confirms transcription t.
+
+        The source's verified text (corrections applied) must equal t's
+        original and english. A differing text may just be a false match
+        (shared background music), so the clip is left for the API instead
+        of taking the other stream's text as a correction.
+        """
+        v, source = self._find(t["clip_id"], "verification_results.json", self._verif)
+        if not v:
+            return None, None
+        stream, other_id = source.rsplit(":", 1)
+        src_t = self._load(stream, "transcriptions.json", self._trans).get(int(other_id), {})
+        for field in ("original", "english"):
+            text = v[f"corrected_{field}"] or src_t.get(field, "")
+            if text.strip() != t[field].strip():
+                return None, None
+        self.hits += 1
+        return {
+            "clip_id": t["clip_id"],
+            "original": True,
+            "english": True,
+            "corrected_original": "",
+            "corrected_english": "",
+            "notes": v.get("notes", ""),
+            "dedup_of": source,
+        }, source
+
+    def hit_rate(self):
+        return self.hits / self.checked if self.checked else 0.0
@@ -0,0 +1,109 @@
+"""Persistent quota ledger shared by every process using the API
+
+Counts requests per quota day and per minute for each key/model shard,
+plus when a shard last ran out of quota. Stored as JSON (QUOTA_LEDGER),
+guarded by a file lock so concurrent scripts don't lose updates.
+
+Shards are identified by a hash of the key, never the key itself.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from zoneinfo import ZoneInfo
+
+from config import QUOTA_LEDGER, QUOTA_TZ, RPD_LIMIT
+
+KEEP_DAYS = 7
+KEEP_MINUTES = 60
+
+def shard_id(key, model):
+    return f"{hashlib.sha1(key.encode()).hexdigest()[:8]}/{model}"
+
+def quota_day(ts):
+    """Quota day a timestamp belongs to (quota resets at midnight QUOTA_TZ)"""
+    return datetime.fromtimestamp(ts, ZoneInfo(QUOTA_TZ)).strftime("%Y-%m-%d")
+
+def next_reset(ts):
+    """Timestamp of the next quota reset after ts"""
+    local = datetime.fromtimestamp(ts, ZoneInfo(QUOTA_TZ))
+    midnight = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.timestamp()
+
+def _minute(ts):
+    return datetime.fromtimestamp(ts, ZoneInfo(QUOTA_TZ)).strftime("%Y-%m-%dT%H:%M")
+
+def next_minute(ts):
+    """Start of the minute after ts (per-minute counts roll over there)"""
+    return (ts // 60 + 1) * 60
+
+class Ledger:
+    def __init__(self, path=QUOTA_LEDGER):
+        self.path = path
+        self.lock = Lock()
+
+    def _read(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                return json.load(f)
+        return {"shards": {}}
+
+    def _update(self, fn):
+        """Read-modify-write under thread + file lock"""
+        with self.lock, open(self.path + ".lock", "w") as lockf:
+            fcntl.flock(lockf, fcntl.LOCK_EX)
+            data = self._read()
+            result = fn(data)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+            return result
+
+    def snapshot(self):
+        with self.lock:
+            return self._read()
+
+    def record(self, shard, exhausted_until=None):
+        """Count one request for shard; optionally mark it out of quota"""
+        now = time.time()
+        day, minute = quota_day(now), _minute(now)
+
+        def fn(data):
+            s = data["shards"].setdefault(shard, {"days": {}, "minutes": {}, "exhausted_until": 0})
+            s["days"][day] = s["days"].get(day, 0) + 1
+            s["minutes"][minute] = s["minutes"].get(minute, 0) + 1
+            if exhausted_until:
+                s["exhausted_until"] = max(s["exhausted_until"], exhausted_until)
+            s["days"] = {d: n for d, n in sorted(s["days"].items())[-KEEP_DAYS:]}
+            s["minutes"] = {m: n for m, n in sorted(s["minutes"].items())[-KEEP_MINUTES:]}
+        self._update(fn)
+
+    def shard_state(self, shard, data=None):
+        """(used today, used this minute, exhausted_until) for shard"""
+        now = time.time()
+        data = data or self.snapshot()
+        s = data["shards"].get(shard, {})
+        return (
+            s.get("days", {}).get(quota_day(now), 0),
+            s.get("minutes", {}).get(_minute(now), 0),
+            s.get("exhausted_until", 0),
+        )
+
+    def remaining_today(self, shard, data=None):
+        used, _, exhausted_until = self.shard_state(shard, data)
+        if exhausted_until > time.time():
+            return 0
+        return max(0, RPD_LIMIT - used)
+
+    def available_at(self, shard, data=None):
+        """When shard can take requests again (now if it has quota left)"""
+        now = time.time()
+        used, _, exhausted_until = self.shard_state(shard, data)
+        if used >= RPD_LIMIT:
+            exhausted_until = max(exhausted_until, next_reset(now))
+        return max(now, exhausted_until)
@@ -0,0 +1,45 @@
+"""Cached heavy resources (Silero, Gemini client pool, ffmpeg pool)
+
+Each loader builds its resource once per process. Standalone scripts pay
+the cost every run; the daemon (lib/daemon.py) keeps them warm.
+"""
+
+_cache = {}
+
+def load_silero(onnx=False):
+    """Load Silero VAD via torch.hub, returns (model, utils)
+
+    onnx=True loads the ONNX Runtime build (needs onnxruntime), which
+    accepts a batch of windows per call.
+    """
+    key = "silero_onnx" if onnx else "silero"
+    if key not in _cache:
+        import torch
+        torch.set_num_threads(1)
+        print(f"Loading Silero VAD ({'onnx' if onnx else 'torch'})...")
+        _cache[key] = torch.hub.load(
+            repo_or_dir='snakers4/silero-vad',
+            model='silero_vad',
+            force_reload=False,
+            onnx=onnx
+        )
+    return _cache[key]
+
+def get_client_pool():
+    """Get the Gemini client pool for the configured keys/models"""
+    from config import GEMINI_MODELS, get_api_keys
+    config = (tuple(get_api_keys()), tuple(GEMINI_MODELS))
+    if _cache.get("pool_config") != config:
+        from clientpool import ClientPool
+        from ledger import Ledger
+        _cache["pool"] = ClientPool(keys=list(config[0]), models=list(config[1]), ledger=Ledger())
+        _cache["pool_config"] = config
+    return _cache["pool"]
+
+def get_ffmpeg_pool():
+    """Thread pool for running ffmpeg subprocesses in parallel"""
+    if "ffmpeg" not in _cache:
+        from concurrent.futures import ThreadPoolExecutor
+        from config import FFMPEG_WORKERS
+        _cache["ffmpeg"] = ThreadPoolExecutor(max_workers=FFMPEG_WORKERS)
+    return _cache["ffmpeg"]
@@ -0,0 +1,100 @@
+"""Array-backed segment table with interval queries
+
+Column view of segments.json (start/end/duration/batch as NumPy arrays),
+cached as segments.npz next to it. Clip id == segment id == row index, and
+batch == clip_id // BATCH_SIZE, as everywhere else in the pipeline.
+
+    table = SegmentTable.load()
+    table.overlapping(4980, 5100)   # clip ids overlapping 01:23:00-01:25:00
+    table.batch_at(5000)            # batch whose audio covers t, or -1
+"""
+
+import json
+import os
+
+import numpy as np
+
+from config import BATCH_SIZE, EDGE_PADDING
+
+class SegmentTable:
+    def __init__(self, start, end, duration):
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.duration = np.asarray(duration, dtype=np.float64)
+        n = len(self.start)
+        self.batch = np.arange(n, dtype=np.int32) // BATCH_SIZE
+        # Running max of ends: sorted even if padded segments overlap
+        self._end_max = np.maximum.accumulate(self.end) if n else self.end
+        firsts = np.arange(0, n, BATCH_SIZE)
+        self.batch_start = self.start[firsts]
+        self.batch_end = self.end[np.minimum(firsts + BATCH_SIZE, n) - 1] if n else self.end
+
+    def __len__(self):
+        return len(self.start)
+
+    @property
+    def num_batches(self):
+        return len(self.batch_start)
+
+    @classmethod
+    def from_segments(cls, segments):
+        return cls(
+            [s["start"] for s in segments],
+            [s["end"] for s in segments],
+            [s["duration"] for s in segments],
+        )
+
+    @classmethod
+    def load(cls, stream_dir="."):
+        """Load segments.npz, rebuilding it if segments.json is newer"""
+        json_path = os.path.join(stream_dir, "segments.json")
+        npz_path = os.path.join(stream_dir, "segments.npz")
+        if os.path.exists(npz_path) and (
+            not os.path.exists(json_path) or os.path.getmtime(npz_path) >= os.path.getmtime(json_path)
+        ):
+            with np.load(npz_path) as data:
+                return cls(data["start"], data["end"], data["duration"])
+
+        with open(json_path) as f:
+            table = cls.from_segments(json.load(f)["segments"])
+        table.save(npz_path)
+        return table
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, start=self.start, end=self.end, duration=self.duration)
+
+    def overlapping(self, t0, t1):
+        """Clip ids whose [start, end) overlaps [t0, t1]"""
+        hi = np.searchsorted(self.start, t1, side="right")
+        lo = np.searchsorted(self._end_max, t0, side="right")
+        ids = np.arange(lo, hi)
+        return ids[self.end[lo:hi] > t0]
+
+    def clip_at(self, t):
+        """Clip id containing time t, or -1"""
+        ids = self.overlapping(t, t)
+        return int(ids[0]) if len(ids) else -1
+
+    def batch_range(self, b):
+        """Slice of clip ids in batch b"""
+        return slice(b * BATCH_SIZE, min((b + 1) * BATCH_SIZE, len(self)))
+
+    def batch_audio_span(self, b):
+        """(audio_start, audio_end) of batch b's audio file, with edge padding"""
+        return max(0.0, float(self.batch_start[b]) - EDGE_PADDING), float(self.batch_end[b]) + EDGE_PADDING
+
+    def batch_at(self, t):
+        """Batch whose audio covers time t, or -1"""
+        b = int(np.searchsorted(self.batch_start - EDGE_PADDING, t, side="right")) - 1
+        if b < 0 or t > self.batch_end[b] + EDGE_PADDING:
+            return -1
+        return b
+
+    def gaps(self):
+        """(gap to previous, gap to next) per clip, inf at the ends"""
+        if not len(self):
+            return self.start.copy(), self.start.copy()
+        between = self.start[1:] - self.end[:-1]
+        inf = np.array([np.inf])
+        return np.concatenate([inf, between]), np.concatenate([between, inf])
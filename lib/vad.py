@@ -0,0 +1,119 @@
+"""Silero VAD helpers: torch path, batched ONNX path, segment conversion"""
+
+import torch
+
+from config import VAD_PARAMS, VAD_SHARD_WARMUP_S
+
+SAMPLE_RATE = 16000
+WINDOW = 512  # Silero window at 16kHz
+
+def timestamp_kwargs():
+    return dict(
+        sampling_rate=SAMPLE_RATE,
+        min_silence_duration_ms=VAD_PARAMS["min_silence_duration_ms"],
+        speech_pad_ms=VAD_PARAMS["speech_pad_ms"],
+        min_speech_duration_ms=VAD_PARAMS["min_speech_duration_ms"],
+    )
+
+def speech_timestamps(wav, model, utils):
+    """Reference path: Silero's own loop, one window per model call"""
+    get_speech_timestamps = utils[0]
+    return get_speech_timestamps(wav, model, **timestamp_kwargs())
+
+def speech_probs(wav, model):
+    """Per-window speech probabilities, one window per call"""
+    model.reset_states()
+    probs = []
+    for start in range(0, len(wav), WINDOW):
+        chunk = wav[start : start + WINDOW]
+        if len(chunk) < WINDOW:
+            chunk = torch.nn.functional.pad(chunk, (0, WINDOW - len(chunk)))
+        probs.append(model(chunk, SAMPLE_RATE).item())
+    return probs
+
+def _lanes(wavs, shards):
+    """Split each wav into window-aligned shards with a warmup lead-in.
+
+    Returns (wav_idx, lane_start, shard_start, shard_end) in samples.
+    """
+    warmup = int(VAD_SHARD_WARMUP_S * SAMPLE_RATE) // WINDOW * WINDOW
+    lanes = []
+    for wav_idx, wav in enumerate(wavs):
+        n_windows = (len(wav) + WINDOW - 1) // WINDOW
+        per_shard = (n_windows + shards - 1) // shards
+        for s in range(shards):
+            shard_start = s * per_shard * WINDOW
+            shard_end = min((s + 1) * per_shard * WINDOW, n_windows * WINDOW)
+            if shard_start >= shard_end:
+                break
+            lanes.append((wav_idx, max(0, shard_start - warmup), shard_start, shard_end))
+    return lanes
+
+def speech_probs_batched(wavs, model, shards=1):
+    """Per-window speech probabilities for several wavs in one pass.
+
+    Every model call gets one window from each lane (stream or shard of a
+    stream) as a (lanes, WINDOW) batch. The ONNX wrapper keeps a separate
+    state row per lane, so lanes don't interfere. Shards start
+    VAD_SHARD_WARMUP_S early so the model state has settled by the shard
+    boundary; the warmup probabilities are discarded.
+    """
+    lanes = _lanes(wavs, shards)
+    if not lanes:
+        return [[] for _ in wavs]
+    steps = max((end - lane_start) // WINDOW for _, lane_start, _, end in lanes)
+    model.reset_states(len(lanes))
+
+    lane_probs = [[] for _ in lanes]
+    batch = torch.zeros(len(lanes), WINDOW)
+    for step in range(steps):
+        batch.zero_()
+        for i, (wav_idx, lane_start, _, end) in enumerate(lanes):
+            pos = lane_start + step * WINDOW
+            if pos < end:
+                chunk = wavs[wav_idx][pos : pos + WINDOW]
+                batch[i, :len(chunk)] = chunk
+        out = model(batch, SAMPLE_RATE)
+        for i, p in enumerate(out[:, 0].tolist()):
+            lane_probs[i].append(p)
+
+    probs = [[] for _ in wavs]
+    for (wav_idx, lane_start, shard_start, end), lp in zip(lanes, lane_probs):
+        skip = (shard_start - lane_start) // WINDOW
+        probs[wav_idx].extend(lp[skip : skip + (end - shard_start) // WINDOW])
+    return probs
+
+class _ProbReplay:
+    """Stands in for the model, returning precomputed window probabilities"""
+
+    def __init__(self, probs):
+        self.probs = probs
+        self.pos = 0
+
+    def reset_states(self, batch_size=1):
+        self.pos = 0
+
+    def __call__(self, chunk, sr):
+        p = self.probs[self.pos]
+        self.pos += 1
+        return torch.tensor([p])
+
+def timestamps_from_probs(wav, probs, utils):
+    """Run Silero's timestamp logic over precomputed probabilities"""
+    get_speech_timestamps = utils[0]
+    return get_speech_timestamps(wav, _ProbReplay(probs), **timestamp_kwargs())
+
+def to_segments(speech_timestamps):
+    """Convert Silero timestamps (samples) to padded segments (seconds)"""
+    pad = VAD_PARAMS["post_pad_s"]
+    segments = []
+    for i, ts in enumerate(speech_timestamps):
+        start = max(0, ts['start'] / SAMPLE_RATE - pad)
+        end = ts['end'] / SAMPLE_RATE + pad
+        segments.append({
+            "segment_id": i,
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "duration": round(end - start, 3)
+        })
+    return segments
@@ -0,0 +1,155 @@
+"""ClientPool routing, failover and stats against a local fake client
+
+    python -m pytest tests/
+"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
+from clientpool import ClientPool, QuotaExhausted, BudgetSpent
+from config import RPD_LIMIT
+from ledger import Ledger, _minute, quota_day, shard_id
+
+class FakeClient:
+    """Answers {"key", "model"}; keys in `exhausted` fail with RESOURCE_EXHAUSTED"""
+
+    def __init__(self, key, exhausted, calls):
+        self.key = key
+        self.exhausted = exhausted
+        self.calls = calls
+
+    def generate_with_audio(self, model, path, prompt, schema, mime_type):
+        self.calls.append((self.key, model))
+        if self.key in self.exhausted:
+            raise Exception("429 RESOURCE_EXHAUSTED: quota exceeded")
+        if self.key == "broken":
+            raise ValueError("bad response")
+        return {"key": self.key, "model": model}
+
+def make_pool(keys, models=("model-a",), exhausted=(), rpm=6000, ledger=None):
+    calls = []
+    pool = ClientPool(
+        keys=list(keys), models=list(models), rpm=rpm,
+        client_factory=lambda key: FakeClient(key, set(exhausted), calls),
+        ledger=ledger,
+    )
+    return pool, calls
+
+def ask(pool):
+    return pool.generate_with_audio("clip.m4a", "prompt", dict)
+
+def test_routes_to_shard_with_most_headroom():
+    # At 60 rpm each shard has one slot per second: a shard just used has to
+    # wait, so the next request goes to the idle one
+    pool, calls = make_pool(["key-1", "key-2"], rpm=60)
+    assert ask(pool)["key"] == "key-1"
+    assert ask(pool)["key"] == "key-2"
+
+    # Once both are waiting, the one whose slot comes first wins
+    pool.shards[0].limiter.next_slot = time.time() + 30
+    pool.shards[1].limiter.next_slot = time.time() + 0.01
+    assert ask(pool)["key"] == "key-2"
+
+def test_prefers_lower_model_tier_when_equally_free():
+    pool, _ = make_pool(["key-1"], models=["model-a", "model-b"])
+    assert ask(pool)["model"] == "model-a"
+
+def test_skips_shards_used_up_in_ledger(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.json"))
+    with open(ledger.path, "w") as f:
+        json.dump({"shards": {shard_id("key-1", "model-a"): {
+            "days": {quota_day(time.time()): RPD_LIMIT}, "minutes": {}, "exhausted_until": 0,
+        }}}, f)
+    pool, calls = make_pool(["key-1", "key-2"], ledger=ledger)
+
+    assert ask(pool)["key"] == "key-2"
+    assert calls == [("key-2", "model-a")]
+    assert ledger.shard_state(shard_id("key-2", "model-a"))[0] == 1
+
+def test_prefers_shard_with_most_requests_left_today(tmp_path):
+    ledger = Ledger(str(tmp_path / "ledger.json"))
+    with open(ledger.path, "w") as f:
+        json.dump({"shards": {shard_id("key-1", "model-a"): {
+            "days": {quota_day(time.time()): RPD_LIMIT - 1}, "minutes": {}, "exhausted_until": 0,
+        }}}, f)
+    pool, _ = make_pool(["key-1", "key-2"], ledger=ledger)
+    assert ask(pool)["key"] == "key-2"
+
+def test_respects_per_minute_counts_from_other_processes(tmp_path):
+    # Another process already sent a full minute's worth on key-1
+    ledger = Ledger(str(tmp_path / "ledger.json"))
+    with open(ledger.path, "w") as f:
+        json.dump({"shards": {shard_id("key-1", "model-a"): {
+            "days": {}, "minutes": {_minute(time.time()): 6000}, "exhausted_until": 0,
+        }}}, f)
+    pool, calls = make_pool(["key-1", "key-2"], ledger=ledger)
+
+    assert ask(pool)["key"] == "key-2"
+    assert ask(pool)["key"] == "key-2"
+    assert ledger.shard_state(shard_id("key-2", "model-a"))[1] == 2
+
+def test_fails_over_on_resource_exhausted(capsys):
+    pool, calls = make_pool(["key-1", "key-2"], exhausted=["key-1"])
+
+    assert ask(pool)["key"] == "key-2"
+    assert calls == [("key-1", "model-a"), ("key-2", "model-a")]
+    assert pool.shards[0].parked_until > time.time()
+    assert "quota exhausted, parked" in capsys.readouterr().out
+
+    # Parked shard isn't tried again
+    ask(pool)
+    assert calls[-1] == ("key-2", "model-a")
+
+def test_quota_exhausted_only_when_all_shards_parked():
+    pool, calls = make_pool(["key-1", "key-2"], models=["model-a", "model-b"], exhausted=["key-1"])
+    # key-2 shards still live: no error
+    ask(pool)
+    assert all(s.parked_until == 0 for s in pool.shards if s.key == "key-2")
+
+    pool, calls = make_pool(["key-1", "key-2"], exhausted=["key-1", "key-2"])
+    with pytest.raises(QuotaExhausted):
+        ask(pool)
+    # Each shard tried exactly once before giving up
+    assert sorted(calls) == [("key-1", "model-a"), ("key-2", "model-a")]
+    assert all(s.parked_until > time.time() for s in pool.shards)
+
+def test_other_errors_are_raised_without_parking():
+    pool, _ = make_pool(["broken", "key-2"])
+    with pytest.raises(ValueError):
+        ask(pool)
+    assert pool.shards[0].parked_until == 0
+    assert pool.shards[0].stats["errors"] == 1
+
+def test_budget():
+    pool, calls = make_pool(["key-1"])
+    pool.reset_stats(budget=2)
+    ask(pool)
+    ask(pool)
+    with pytest.raises(BudgetSpent):
+        ask(pool)
+    assert len(calls) == 2
+
+def test_per_shard_stats():
+    pool, _ = make_pool(["key-1", "key-2"], exhausted=["key-1"])
+    for _ in range(3):
+        ask(pool)
+
+    one, two = pool.shards
+    assert (one.stats["requests"], one.stats["ok"], one.stats["quota"], one.stats["errors"]) == (1, 0, 1, 0)
+    assert (two.stats["requests"], two.stats["ok"], two.stats["quota"], two.stats["errors"]) == (3, 3, 0, 0)
+
+    one.stats["busy_s"], two.stats["busy_s"] = 0.5, 3.0
+    lines = pool.report()
+    assert len(lines) == 2
+    assert lines[0].endswith("0.5s/request")
+    assert lines[1].endswith("1.0s/request")
+    assert lines[0].startswith("  ...ey-1/model-a: 0 ok, 0 errors, 1 quota hits")
+    assert lines[1].startswith("  ...ey-2/model-a: 3 ok, 0 errors, 0 quota hits")
+
+    pool.reset_stats()
+    assert pool.report() == []
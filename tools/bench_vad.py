@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark VAD backends on CPU and check the ONNX path against torch
+
+    tools/bench_vad.py <stream-id> [stream-id ...] [--seconds 600] [--lanes 8]
+
+Reports frames/sec (512-sample windows) for:
+  torch        - JIT model, one window per call (what 02_vad.py does by default)
+  onnx         - ONNX model, one window per call
+  onnx-batch   - ONNX model, all streams x shards in one call per step
+
+Then compares segments from the batched ONNX path against the torch path.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+from config import get_stream_dir
+from models import load_silero
+from vad import SAMPLE_RATE, WINDOW, speech_timestamps, speech_probs, speech_probs_batched, timestamps_from_probs, to_segments
+
+TOLERANCE_S = 0.1  # Max boundary drift accepted between backends
+
+def get_arg(name, default):
+    if name in sys.argv:
+        i = sys.argv.index(name)
+        return type(default)(sys.argv[i + 1])
+    return default
+
+def compare(ref, other):
+    """Returns (matched, max boundary delta) between two segment lists"""
+    if len(ref) != len(other):
+        return False, None
+    delta = max((max(abs(a["start"] - b["start"]), abs(a["end"] - b["end"])) for a, b in zip(ref, other)), default=0.0)
+    return delta <= TOLERANCE_S, delta
+
+def main():
+    seconds = get_arg("--seconds", 600)
+    lanes = get_arg("--lanes", 8)
+    stream_ids = [a for i, a in enumerate(sys.argv[1:], 1) if not a.startswith("--") and sys.argv[i - 1] not in ("--seconds", "--lanes")]
+    if not stream_ids:
+        print(__doc__)
+        sys.exit(1)
+
+    torch_model, utils = load_silero()
+    onnx_model, _ = load_silero(onnx=True)
+    read_audio = utils[1]
+
+    wavs = []
+    for sid in stream_ids:
+        wav = read_audio(os.path.join(get_stream_dir(sid), "stream.m4a"), sampling_rate=SAMPLE_RATE)
+        wavs.append(wav[: seconds * SAMPLE_RATE])
+    frames = sum((len(w) + WINDOW - 1) // WINDOW for w in wavs)
+    shards = max(1, lanes // len(wavs))
+    print(f"Audio: {len(wavs)} streams, {sum(len(w) for w in wavs) / SAMPLE_RATE / 60:.1f} min, {frames} frames")
+    print(f"Batch: {len(wavs)} streams x {shards} shards = {len(wavs) * shards} lanes\n")
+
+    results = {}
+
+    t = time.time()
+    torch_probs = [speech_probs(w, torch_model) for w in wavs]
+    results["torch"] = time.time() - t
+
+    t = time.time()
+    for w in wavs:
+        speech_probs(w, onnx_model)
+    results["onnx"] = time.time() - t
+
+    t = time.time()
+    batch_probs = speech_probs_batched(wavs, onnx_model, shards=shards)
+    results["onnx-batch"] = time.time() - t
+
+    for name, elapsed in results.items():
+        print(f"{name:12s} {elapsed:7.2f}s  {frames / elapsed:9.0f} frames/sec  ({results['torch'] / elapsed:.1f}x)")
+
+    print("\nSegments vs torch:")
+    ok = True
+    for sid, wav, tp, bp in zip(stream_ids, wavs, torch_probs, batch_probs):
+        ref = to_segments(speech_timestamps(wav, torch_model, utils))
+        other = to_segments(timestamps_from_probs(wav, bp, utils))
+        matched, delta = compare(ref, other)
+        prob_delta = max(abs(a - b) for a, b in zip(tp, bp))
+        if delta is None:
+            print(f"  {sid}: MISMATCH {len(ref)} vs {len(other)} segments (max prob diff {prob_delta:.4f})")
+        else:
+            print(f"  {sid}: {len(ref)} segments, max boundary diff {delta:.3f}s, max prob diff {prob_delta:.4f} {'✓' if matched else '✗'}")
+        ok = ok and matched
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Fingerprint every clip in streams/ into the dedup index
+
+    tools/index_fingerprints.py [stream-id ...]
+
+04_transcribe.py and 07_verify.py index their own clips as they go; run
+this once to backfill streams processed before dedup existed.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+from config import STREAMS_DIR, FINGERPRINT_DB
+from fingerprint import FingerprintIndex
+
+def main():
+    stream_ids = sys.argv[1:] or sorted(
+        d for d in os.listdir(STREAMS_DIR) if os.path.isdir(os.path.join(STREAMS_DIR, d, "clips"))
+    )
+    index = FingerprintIndex()
+    total = 0
+    for sid in stream_ids:
+        added = index.index_stream(os.path.join(STREAMS_DIR, sid))
+        total += added
+        print(f"{sid}: +{added} clips")
+    index.close()
+
+    print(f"\nIndexed {total} new clips")
+    print(f"Index: {FINGERPRINT_DB}")
+
+if __name__ == "__main__":
+    main()
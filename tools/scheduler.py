@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Resume interrupted streams automatically, spreading API use over the quota day
+
+    tools/scheduler.py [--tick 900] [--once]
+
+Every tick:
+  1. Find interrupted streams: transcriptions.json missing batches, or
+     07 started (verify_started) and verification_results.json missing clips.
+  2. Read the quota ledger: requests left today across all key/model shards.
+  3. Tick budget = left today * tick / seconds until reset.
+  4. Run 04/07 on interrupted streams with --budget until the tick budget is spent.
+
+When every shard is out of quota it sleeps until one has quota again
+(next reset for daily exhaustion). Replaces
+`while true; do ../../07_verify.py; sleep 180; done`.
+"""
+
+import glob
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+from config import STREAMS_DIR, GEMINI_MODELS, get_api_keys
+from ledger import Ledger, shard_id, next_reset
+
+def get_arg(name, default):
+    if name in sys.argv:
+        return type(default)(sys.argv[sys.argv.index(name) + 1])
+    return default
+
+def load_records(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else data["transcriptions"]
+
+def pending_stage(stream_dir):
+    """Stage script to resume for an interrupted stream, or None"""
+    trans = os.path.join(stream_dir, "transcriptions.json")
+    if os.path.exists(trans):
+        n_batches = len(glob.glob(os.path.join(stream_dir, "batch_audio", "batch_*.m4a")))
+        done = set(t.get("batch_idx") for t in load_records(trans))
+        if len(done) < n_batches:
+            return "04_transcribe.py"
+
+    verif = os.path.join(stream_dir, "verification_results.json")
+    if os.path.exists(verif) or os.path.exists(os.path.join(stream_dir, "verify_started")):
+        cleaned = os.path.join(stream_dir, "transcriptions_cleaned.json")
+        expected = set(t["clip_id"] for t in load_records(cleaned if os.path.exists(cleaned) else trans))
+        selection = os.path.join(stream_dir, "verify_selection.json")
+        if os.path.exists(selection):
+            with open(selection) as f:
+                sel = json.load(f)
+            expected &= set(sel["flagged"]) | set(sel["audit"])
+        verified = set(r["clip_id"] for r in load_records(verif) if "error" not in r) if os.path.exists(verif) else set()
+        if expected - verified:
+            return "07_verify.py"
+    return None
+
+def interrupted_streams():
+    found = []
+    for name in sorted(os.listdir(STREAMS_DIR)):
+        d = os.path.join(STREAMS_DIR, name)
+        if os.path.isdir(d):
+            stage = pending_stage(d)
+            if stage:
+                found.append((name, stage))
+    return found
+
+def quota_left(ledger, shard_ids):
+    data = ledger.snapshot()
+    return sum(ledger.remaining_today(s, data) for s in shard_ids)
+
+def main():
+    tick = get_arg("--tick", 900)
+    once = "--once" in sys.argv
+    ledger = Ledger()
+    shard_ids = [shard_id(k, m) for m in GEMINI_MODELS for k in get_api_keys()]
+    print(f"Scheduler: {len(shard_ids)} shards, tick {tick}s", flush=True)
+
+    while True:
+        streams = interrupted_streams()
+        now = time.time()
+        reset = next_reset(now)
+        left = quota_left(ledger, shard_ids)
+
+        if not streams:
+            print(f"[{time.strftime('%H:%M')}] Nothing to resume", flush=True)
+        elif left == 0:
+            wake = min(ledger.available_at(s) for s in shard_ids)
+            print(f"[{time.strftime('%H:%M')}] Quota spent, sleeping {(wake - now) / 3600:.1f}h", flush=True)
+        else:
+            budget = max(1, math.ceil(left * min(1.0, tick / (reset - now))))
+            print(f"[{time.strftime('%H:%M')}] {len(streams)} interrupted, {left} requests left today, tick budget {budget}", flush=True)
+
+            for name, stage in streams:
+                if budget <= 0:
+                    break
+                before = quota_left(ledger, shard_ids)
+                print(f"\n>>> {stage} --stream {name} --budget {budget}", flush=True)
+                subprocess.run([sys.executable, os.path.join(ROOT, stage), "--stream", name, "--budget", str(budget)])
+                budget -= max(0, before - quota_left(ledger, shard_ids))
+                if quota_left(ledger, shard_ids) == 0:
+                    break
+
+        if once:
+            break
+        if streams and quota_left(ledger, shard_ids) == 0:
+            wake = min(ledger.available_at(s) for s in shard_ids)
+            time.sleep(max(60, wake - time.time() + 60))
+        else:
+            time.sleep(tick)
+
+if __name__ == "__main__":
+    main()